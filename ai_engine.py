@@ -3,16 +3,27 @@ Enhanced AI Engine with Movement Type Classification
 """
 from __future__ import annotations
 
+import asyncio
+import hashlib
 import os
+import re
+import sqlite3
 from dotenv import load_dotenv
 
 load_dotenv()
 
-import json
 from dataclasses import dataclass
-from typing import Any, Dict, List, Optional, Tuple
+from typing import Any, Dict, Iterator, List, Optional, Tuple
 
-from openai import OpenAI
+import httpx
+import orjson
+from openai import AsyncOpenAI, OpenAI, OpenAIError
+
+VALID_MOVEMENT_TYPES = frozenset(("Mobility", "Activation", "Stability", "Power", "Balance"))
+
+# Keep-alive connection pool shared by all requests made through one client
+HTTP_LIMITS = httpx.Limits(max_connections=32, max_keepalive_connections=16)
+HTTP_TIMEOUT = httpx.Timeout(60.0, connect=5.0)
 
 
 @dataclass
@@ -23,6 +34,89 @@ class WarmupMove:
     movement_type: str = "Mobility"  # Mobility, Activation, Stability, Power, Balance
 
 
+def _coerce_int(value: Any) -> int:
+    """Convert a model-supplied number to int; 0 if it isn't numeric."""
+    if type(value) is int:
+        return value
+    try:
+        return int(value)
+    except (TypeError, ValueError, OverflowError):
+        return 0
+
+
+def _coerce_movement_type(value: Any) -> str:
+    """Return value as a valid movement type, defaulting to Mobility."""
+    movement_type = str(value).strip()
+    return movement_type if movement_type in VALID_MOVEMENT_TYPES else "Mobility"
+
+
+class _WarmupStreamScanner:
+    """
+    Incremental brace-balance scanner over streamed model output.
+    
+    feed() returns each object of the top-level "warmups" array as soon as
+    its closing brace arrives, so warmups can be shown before the whole
+    response has been generated.
+    """
+
+    _ARRAY_START = re.compile(r'"warmups"\s*:\s*\[')
+
+    def __init__(self) -> None:
+        self._buffer = ""
+        self._pos = -1  # next index to scan; -1 until the array is found
+        self._depth = 0
+        self._obj_start = 0
+        self._in_string = False
+        self._escape = False
+        self._done = False
+
+    def feed(self, chunk: str) -> List[Dict[str, Any]]:
+        self._buffer += chunk
+        items: List[Dict[str, Any]] = []
+        if self._done:
+            return items
+
+        if self._pos < 0:
+            match = self._ARRAY_START.search(self._buffer)
+            if not match:
+                return items
+            self._pos = match.end()
+
+        buf = self._buffer
+        i = self._pos
+        while i < len(buf):
+            ch = buf[i]
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif ch == "\\":
+                    self._escape = True
+                elif ch == '"':
+                    self._in_string = False
+            elif ch == '"':
+                self._in_string = True
+            elif ch == "{":
+                if self._depth == 0:
+                    self._obj_start = i
+                self._depth += 1
+            elif ch == "}":
+                self._depth -= 1
+                if self._depth == 0:
+                    try:
+                        obj = orjson.loads(buf[self._obj_start : i + 1])
+                    except ValueError:
+                        obj = None
+                    if isinstance(obj, dict):
+                        items.append(obj)
+            elif ch == "]" and self._depth == 0:
+                self._done = True
+                break
+            i += 1
+
+        self._pos = i
+        return items
+
+
 class AIEngine:
     """
     Enhanced AI Engine that classifies exercises by movement type
@@ -61,13 +155,116 @@ class AIEngine:
         "dance": "Dance", "ballet": "Dance", "hip hop": "Dance", "zumba": "Dance",
     }
 
-    def __init__(self, model: str = "gpt-4o-mini") -> None:
+    # Single-word keys, looked up per word of the exercise name. Words that
+    # only appear inside multi-word keys ("hip", "table", "rock", "arts")
+    # are not sports on their own, so they are not indexed.
+    _PARTIAL_INDEX = {
+        sport_key: category
+        for sport_key, category in SPORT_CATEGORIES.items()
+        if " " not in sport_key
+    }
+
+    # Multi-word keys match only when all of their words are present
+    _PHRASE_KEYS = tuple(
+        (frozenset(sport_key.split()), category)
+        for sport_key, category in SPORT_CATEGORIES.items()
+        if " " in sport_key
+    )
+
+    # Last resort for run-together names ("trailrunning"): single-word keys
+    # that start or end a word, longest first. Short keys are left out, since
+    # they turn up inside unrelated words ("dilemma", "abundance").
+    _AFFIX_KEYS = tuple(
+        (sport_key, category)
+        for sport_key, category in sorted(
+            _PARTIAL_INDEX.items(), key=lambda item: len(item[0]), reverse=True
+        )
+        if len(sport_key) >= 6
+    )
+
+    # Upper bound on in-flight OpenAI requests for batch generation
+    MAX_CONCURRENT_REQUESTS = 4
+
+    # Batch API statuses after which a batch will never produce more output
+    BATCH_TERMINAL_STATUSES = frozenset(("completed", "failed", "expired", "cancelled"))
+
+    # Structured outputs format: the API only returns JSON matching this schema
+    WARMUP_RESPONSE_FORMAT = {
+        "type": "json_schema",
+        "name": "warmup_routine",
+        "strict": True,
+        "schema": {
+            "type": "object",
+            "properties": {
+                "warmups": {
+                    "type": "array",
+                    "items": {
+                        "type": "object",
+                        "properties": {
+                            "name": {"type": "string"},
+                            "duration_seconds": {"type": "integer"},
+                            "notes": {"type": "string"},
+                            "movement_type": {
+                                "type": "string",
+                                "enum": sorted(VALID_MOVEMENT_TYPES),
+                            },
+                        },
+                        "required": ["name", "duration_seconds", "notes", "movement_type"],
+                        "additionalProperties": False,
+                    },
+                },
+                "safety": {"type": "string"},
+            },
+            "required": ["warmups", "safety"],
+            "additionalProperties": False,
+        },
+    }
+
+    WARMUP_INSTRUCTIONS = (
+        "You are a sports warm-up assistant. "
+        "Output must be STRICT JSON only, no markdown, no commentary.\n\n"
+        "Schema:\n"
+        "{\n"
+        '  "warmups": [\n'
+        "    {\n"
+        '      "name": string,\n'
+        '      "duration_seconds": integer,\n'
+        '      "notes": string,\n'
+        '      "movement_type": string  // One of: Mobility, Activation, Stability, Power, Balance\n'
+        "    }\n"
+        "  ],\n"
+        '  "safety": string\n'
+        "}\n\n"
+        "Rules:\n"
+        "- Provide 6 to 10 warmups.\n"
+        "- Classify each exercise by movement type:\n"
+        "  * Mobility: Joint range of motion, dynamic stretches\n"
+        "  * Activation: Muscle engagement, neural activation\n"
+        "  * Stability: Core control, balance foundations\n"
+        "  * Power: Explosive movements, plyometrics\n"
+        "  * Balance: Coordination, proprioception\n"
+        "- Include a variety of movement types for comprehensive warm-up.\n"
+        "- Use realistic durations; total time 6-12 minutes.\n"
+        "- Personalize based on user's age, fitness level, and preferences.\n"
+        "- No medical claims; advise consulting professionals when needed.\n"
+    )
+
+    def __init__(
+        self,
+        model: str = "gpt-4o-mini",
+        cache_db: Optional[str] = None
+    ) -> None:
         api_key = os.getenv("OPENAI_API_KEY")
         
         if not api_key:
             raise RuntimeError("Missing OPENAI_API_KEY environment variable.")
-        self.client = OpenAI(api_key=api_key)
+        self._api_key = api_key
+        self.client = OpenAI(
+            api_key=api_key,
+            http_client=httpx.Client(http2=True, limits=HTTP_LIMITS, timeout=HTTP_TIMEOUT),
+        )
         self.model = model
+        self.cache_db = cache_db
 
     def categorize_sport(self, exercise: str) -> str:
         """Categorize the sport/exercise into a category."""
@@ -77,14 +274,90 @@ class AIEngine:
         if exercise_lower in self.SPORT_CATEGORIES:
             return self.SPORT_CATEGORIES[exercise_lower]
         
-        # Partial match
-        for sport_key, category in self.SPORT_CATEGORIES.items():
-            if sport_key in exercise_lower or exercise_lower in sport_key:
+        # Partial match on whole words, most specific (multi-word) keys first
+        tokens = exercise_lower.split()
+        words = set(tokens)
+        for phrase_words, category in self._PHRASE_KEYS:
+            if phrase_words <= words:
+                return category
+        for token in tokens:
+            category = self._PARTIAL_INDEX.get(token)
+            if category:
                 return category
         
+        # Key at the start or end of a word (e.g. "trailrunning")
+        for token in tokens:
+            for sport_key, category in self._AFFIX_KEYS:
+                if token.startswith(sport_key) or token.endswith(sport_key):
+                    return category
+        
         # Default category
         return "Other"
 
+    @staticmethod
+    def _age_bucket(age: Any) -> Optional[str]:
+        """Bucket an age into decades (20s, 30s, ...) so similar profiles share cache entries."""
+        try:
+            return f"{int(age) // 10 * 10}s"
+        except (TypeError, ValueError):
+            return None
+
+    def _cache_key(
+        self,
+        exercise: str,
+        muscle_groups: str,
+        user_data: Optional[Dict[str, Any]] = None
+    ) -> str:
+        """Build a stable SHA-256 key from the canonicalized prompt inputs."""
+        profile = {}
+        for key, value in (user_data or {}).items():
+            if key == "age":
+                value = self._age_bucket(value)
+            elif value is not None:
+                value = str(value).lower().strip()
+            profile[key] = value
+
+        canonical = {
+            "model": self.model,
+            "exercise": exercise.lower().strip(),
+            "muscle_groups": muscle_groups.lower().strip(),
+            "user_data": profile,
+        }
+        return hashlib.sha256(
+            orjson.dumps(canonical, option=orjson.OPT_SORT_KEYS)
+        ).hexdigest()
+
+    def _cache_get(self, key: str) -> Optional[Dict[str, Any]]:
+        """Return the cached routine for key, or None on a miss."""
+        if not self.cache_db:
+            return None
+        try:
+            conn = sqlite3.connect(self.cache_db)
+            row = conn.execute(
+                "SELECT payload FROM warmup_cache WHERE key = ?",
+                (key,)
+            ).fetchone()
+            conn.close()
+        except sqlite3.Error:
+            # The cache is best-effort; a missing table just means a miss.
+            return None
+        return orjson.loads(row[0]) if row else None
+
+    def _cache_put(self, key: str, result: Dict[str, Any]) -> None:
+        """Store a successfully parsed routine in the cache."""
+        if not self.cache_db:
+            return
+        try:
+            conn = sqlite3.connect(self.cache_db)
+            conn.execute(
+                "INSERT OR REPLACE INTO warmup_cache (key, payload) VALUES (?, ?)",
+                (key, orjson.dumps(result).decode())
+            )
+            conn.commit()
+            conn.close()
+        except sqlite3.Error:
+            pass
+
     def _build_prompt(
         self,
         exercise: str,
@@ -115,6 +388,38 @@ class AIEngine:
         
         return base_prompt
 
+    def _request_kwargs(
+        self,
+        exercise: str,
+        muscle_groups: str,
+        user_data: Optional[Dict[str, Any]] = None
+    ) -> Dict[str, Any]:
+        """Build the Responses API arguments shared by the sync and async clients."""
+        return {
+            "model": self.model,
+            "instructions": self.WARMUP_INSTRUCTIONS,
+            "input": self._build_prompt(
+                exercise=exercise,
+                muscle_groups=muscle_groups,
+                user_data=user_data
+            ),
+            "text": {"format": self.WARMUP_RESPONSE_FORMAT},
+        }
+
+    def _lookup_cached(
+        self,
+        exercise: str,
+        muscle_groups: str,
+        user_data: Optional[Dict[str, Any]] = None
+    ) -> Tuple[str, Optional[Dict[str, Any]]]:
+        """Return the cache key and the cached routine (None on a miss)."""
+        cache_key = self._cache_key(exercise, muscle_groups, user_data)
+        cached = self._cache_get(cache_key)
+        if cached is not None:
+            cached["exercise"] = exercise
+            cached["muscle_groups"] = muscle_groups
+        return cache_key, cached
+
     def generate_warmups(
         self,
         exercise: str,
@@ -131,46 +436,254 @@ class AIEngine:
           - warmups: list[{name, duration, notes, movement_type}]
           - safety: str
         """
-        instructions = (
-            "You are a sports warm-up assistant. "
-            "Output must be STRICT JSON only, no markdown, no commentary.\n\n"
-            "Schema:\n"
-            "{\n"
-            '  "warmups": [\n'
-            "    {\n"
-            '      "name": string,\n'
-            '      "duration_seconds": integer,\n'
-            '      "notes": string,\n'
-            '      "movement_type": string  // One of: Mobility, Activation, Stability, Power, Balance\n'
-            "    }\n"
-            "  ],\n"
-            '  "safety": string\n'
-            "}\n\n"
-            "Rules:\n"
-            "- Provide 6 to 10 warmups.\n"
-            "- Classify each exercise by movement type:\n"
-            "  * Mobility: Joint range of motion, dynamic stretches\n"
-            "  * Activation: Muscle engagement, neural activation\n"
-            "  * Stability: Core control, balance foundations\n"
-            "  * Power: Explosive movements, plyometrics\n"
-            "  * Balance: Coordination, proprioception\n"
-            "- Include a variety of movement types for comprehensive warm-up.\n"
-            "- Use realistic durations; total time 6-12 minutes.\n"
-            "- Personalize based on user's age, fitness level, and preferences.\n"
-            "- No medical claims; advise consulting professionals when needed.\n"
-        )
+        cache_key, cached = self._lookup_cached(exercise, muscle_groups, user_data)
+        if cached is not None:
+            return cached
 
         resp = self.client.responses.create(
-            model=self.model,
-            instructions=instructions,
-            input=self._build_prompt(
-                exercise=exercise,
-                muscle_groups=muscle_groups,
-                user_data=user_data
-            ),
+            **self._request_kwargs(exercise, muscle_groups, user_data)
+        )
+
+        result = self._parse_result(exercise, muscle_groups, resp.output_text)
+        if not result["error"]:
+            self._cache_put(cache_key, result)
+        return result
+
+    def generate_warmups_stream(
+        self,
+        exercise: str,
+        muscle_groups: str,
+        user_data: Optional[Dict[str, Any]] = None
+    ) -> Iterator[Dict[str, Any]]:
+        """
+        Stream a warmup routine while the model is still generating it.
+        
+        Yields:
+          - {"type": "warmup", "warmup": {...}} as soon as each warmup's
+            JSON object is complete
+          - {"type": "done", "result": {...}} last, where result has the
+            same shape as generate_warmups
+        """
+        cache_key, cached = self._lookup_cached(exercise, muscle_groups, user_data)
+        if cached is not None:
+            for warmup in cached["warmups"]:
+                yield {"type": "warmup", "warmup": warmup}
+            yield {"type": "done", "result": cached}
+            return
+
+        scanner = _WarmupStreamScanner()
+        with self.client.responses.stream(
+            **self._request_kwargs(exercise, muscle_groups, user_data)
+        ) as stream:
+            for event in stream:
+                if event.type != "response.output_text.delta":
+                    continue
+                for warmup in self._clean_warmups(scanner.feed(event.delta)):
+                    yield {"type": "warmup", "warmup": warmup}
+            output_text = stream.get_final_response().output_text
+
+        result = self._parse_result(exercise, muscle_groups, output_text)
+        if not result["error"]:
+            self._cache_put(cache_key, result)
+        yield {"type": "done", "result": result}
+
+    def generate_warmups_batch(
+        self,
+        items: List[Tuple[str, str, Optional[Dict[str, Any]]]]
+    ) -> List[Dict[str, Any]]:
+        """
+        Generate warmup routines for several exercises concurrently.
+        
+        items is a list of (exercise, muscle_groups, user_data) tuples.
+        Results are returned in the same order, in the same shape as
+        generate_warmups.
+        """
+        return asyncio.run(self._generate_warmups_batch(items))
+
+    async def _generate_warmups_batch(
+        self,
+        items: List[Tuple[str, str, Optional[Dict[str, Any]]]]
+    ) -> List[Dict[str, Any]]:
+        sem = asyncio.Semaphore(self.MAX_CONCURRENT_REQUESTS)
+
+        # The async client is bound to the event loop, so it lives for one batch.
+        async with AsyncOpenAI(
+            api_key=self._api_key,
+            http_client=httpx.AsyncClient(http2=True, limits=HTTP_LIMITS, timeout=HTTP_TIMEOUT),
+        ) as aclient:
+
+            async def _one(
+                exercise: str,
+                muscle_groups: str,
+                user_data: Optional[Dict[str, Any]] = None
+            ) -> Dict[str, Any]:
+                cache_key, cached = self._lookup_cached(exercise, muscle_groups, user_data)
+                if cached is not None:
+                    return cached
+
+                # One failed call must not discard the rest of the batch
+                try:
+                    async with sem:
+                        resp = await aclient.responses.create(
+                            **self._request_kwargs(exercise, muscle_groups, user_data)
+                        )
+                except OpenAIError as e:
+                    return self._error_result(exercise, muscle_groups, "", str(e))
+
+                result = self._parse_result(exercise, muscle_groups, resp.output_text)
+                if not result["error"]:
+                    self._cache_put(cache_key, result)
+                return result
+
+            return list(await asyncio.gather(*(_one(*item) for item in items)))
+
+    def submit_warmup_batch(
+        self,
+        items: List[Tuple[str, str, Optional[Dict[str, Any]]]]
+    ) -> str:
+        """
+        Queue warmup generation through the OpenAI Batch API.
+        
+        items is a list of (exercise, muscle_groups, user_data) tuples.
+        Returns the batch id; pass it to poll_and_ingest once the batch
+        completes to load the results into the warmup cache.
+        """
+        if not self.cache_db:
+            raise RuntimeError("Batch generation requires a cache database.")
+
+        lines = []
+        jobs = []
+        for index, (exercise, muscle_groups, user_data) in enumerate(items):
+            custom_id = f"warmup-{index}"
+            lines.append(orjson.dumps({
+                "custom_id": custom_id,
+                "method": "POST",
+                "url": "/v1/responses",
+                "body": self._request_kwargs(exercise, muscle_groups, user_data),
+            }))
+            jobs.append((
+                custom_id,
+                self._cache_key(exercise, muscle_groups, user_data),
+                exercise,
+                muscle_groups,
+            ))
+
+        batch_file = self.client.files.create(
+            file=("warmups.jsonl", b"\n".join(lines)),
+            purpose="batch",
+        )
+        batch = self.client.batches.create(
+            input_file_id=batch_file.id,
+            endpoint="/v1/responses",
+            completion_window="24h",
+        )
+
+        conn = sqlite3.connect(self.cache_db)
+        conn.executemany(
+            """
+            INSERT INTO warmup_batch_items
+            (batch_id, custom_id, cache_key, exercise, muscle_groups)
+            VALUES (?, ?, ?, ?, ?)
+            """,
+            [(batch.id, *job) for job in jobs]
         )
+        conn.commit()
+        conn.close()
+        return batch.id
+
+    def poll_and_ingest(self, batch_id: str) -> Dict[str, Any]:
+        """
+        Check a batch submitted with submit_warmup_batch and, once it has
+        finished, write every successfully parsed routine into the cache.
+        The batch's job rows are removed for any terminal status.
+        
+        Returns dict with:
+          - status: str (the OpenAI batch status)
+          - ingested: int (number of routines cached)
+        """
+        if not self.cache_db:
+            raise RuntimeError("Batch generation requires a cache database.")
+
+        batch = self.client.batches.retrieve(batch_id)
+        if batch.status not in self.BATCH_TERMINAL_STATUSES:
+            return {"status": batch.status, "ingested": 0}
+
+        conn = sqlite3.connect(self.cache_db)
+        try:
+            ingested = self._ingest_batch_output(conn, batch_id, batch.output_file_id)
+        finally:
+            # Every terminal status ends the batch, so its job rows are no longer needed
+            conn.execute("DELETE FROM warmup_batch_items WHERE batch_id = ?", (batch_id,))
+            conn.commit()
+            conn.close()
+        return {"status": batch.status, "ingested": ingested}
+
+    def _ingest_batch_output(
+        self,
+        conn: sqlite3.Connection,
+        batch_id: str,
+        output_file_id: Optional[str]
+    ) -> int:
+        """Cache every usable routine in a batch output file; returns the count."""
+        # Failed, expired and cancelled batches may have no output at all
+        if not output_file_id:
+            return 0
+
+        jobs = {
+            custom_id: (cache_key, exercise, muscle_groups)
+            for custom_id, cache_key, exercise, muscle_groups in conn.execute(
+                "SELECT custom_id, cache_key, exercise, muscle_groups FROM warmup_batch_items WHERE batch_id = ?",
+                (batch_id,)
+            )
+        }
+
+        ingested = 0
+        output = self.client.files.content(output_file_id).text
+        for line in output.splitlines():
+            if not line.strip():
+                continue
+            try:
+                record = orjson.loads(line)
+            except orjson.JSONDecodeError:
+                continue
+            if not isinstance(record, dict):
+                continue
+            job = jobs.get(record.get("custom_id"))
+            response = record.get("response") or {}
+            if job is None or response.get("status_code") != 200:
+                continue
+
+            cache_key, exercise, muscle_groups = job
+            result = self._parse_result(
+                exercise,
+                muscle_groups,
+                self._output_text(response.get("body") or {})
+            )
+            if not result["error"]:
+                self._cache_put(cache_key, result)
+                ingested += 1
+        return ingested
 
-        raw_text = (resp.output_text or "").strip()
+    @staticmethod
+    def _output_text(body: Dict[str, Any]) -> str:
+        """Extract the text output from a raw Responses API body (batch output)."""
+        texts = []
+        for item in body.get("output") or []:
+            if item.get("type") != "message":
+                continue
+            for part in item.get("content") or []:
+                if part.get("type") == "output_text":
+                    texts.append(part.get("text", ""))
+        return "".join(texts)
+
+    def _parse_result(
+        self,
+        exercise: str,
+        muscle_groups: str,
+        output_text: Optional[str]
+    ) -> Dict[str, Any]:
+        """Parse and validate raw model output into a routine dict."""
+        raw_text = (output_text or "").strip()
         routine_obj, parse_error = self._safe_json_load(raw_text)
 
         warmups: List[Dict[str, Any]] = []
@@ -178,43 +691,15 @@ class AIEngine:
 
         if isinstance(routine_obj, dict):
             safety = str(routine_obj.get("safety", "")).strip()
-            items = routine_obj.get("warmups", [])
-            if isinstance(items, list):
-                for item in items:
-                    if not isinstance(item, dict):
-                        continue
-                    n = str(item.get("name", "")).strip()
-                    d = item.get("duration_seconds", item.get("duration", 0))
-                    try:
-                        d_int = int(d)
-                    except Exception:
-                        d_int = 0
-                    notes = str(item.get("notes", "")).strip()
-                    movement_type = str(item.get("movement_type", "Mobility")).strip()
-                    
-                    # Validate movement type
-                    valid_types = ["Mobility", "Activation", "Stability", "Power", "Balance"]
-                    if movement_type not in valid_types:
-                        movement_type = "Mobility"
-                    
-                    if n and d_int > 0:
-                        warmups.append({
-                            "name": n,
-                            "duration": d_int,
-                            "notes": notes,
-                            "movement_type": movement_type
-                        })
+            warmups = self._clean_warmups(routine_obj.get("warmups", []))
 
         if not warmups:
-            return {
-                "exercise": exercise,
-                "sport_category": self.categorize_sport(exercise),
-                "muscle_groups": muscle_groups,
-                "warmups": [],
-                "safety": "",
-                "raw": raw_text,
-                "error": parse_error or "Could not parse the model output.",
-            }
+            return self._error_result(
+                exercise,
+                muscle_groups,
+                raw_text,
+                parse_error or "Could not parse the model output."
+            )
 
         return {
             "exercise": exercise,
@@ -226,21 +711,54 @@ class AIEngine:
             "error": None,
         }
 
+    def _error_result(
+        self,
+        exercise: str,
+        muscle_groups: str,
+        raw_text: str,
+        error: str
+    ) -> Dict[str, Any]:
+        """Routine dict for a failed generation (same shape, no warmups)."""
+        return {
+            "exercise": exercise,
+            "sport_category": self.categorize_sport(exercise),
+            "muscle_groups": muscle_groups,
+            "warmups": [],
+            "safety": "",
+            "raw": raw_text,
+            "error": error,
+        }
+
+    @staticmethod
+    def _clean_warmups(items: Any) -> List[Dict[str, Any]]:
+        """Validate model warmup items, dropping unnamed or zero-length ones."""
+        if not isinstance(items, list):
+            return []
+        # Local aliases keep the comprehension off the global/builtin lookups
+        _str = str
+        _strip = str.strip
+        _int = _coerce_int
+        _movement_type = _coerce_movement_type
+        return [
+            {
+                "name": n,
+                "duration": d,
+                "notes": _strip(_str(item.get("notes", ""))),
+                "movement_type": _movement_type(item.get("movement_type", "Mobility")),
+            }
+            for item in items
+            if isinstance(item, dict)
+            and (n := _strip(_str(item.get("name", ""))))
+            and (d := _int(item.get("duration_seconds", item.get("duration", 0)))) > 0
+        ]
+
     @staticmethod
     def _safe_json_load(text: str) -> Tuple[Optional[Any], Optional[str]]:
         if not text:
             return None, "Empty model output."
+        # Structured outputs guarantee schema-conformant JSON, so there is
+        # no need to salvage objects embedded in prose or markdown fences.
         try:
-            return json.loads(text), None
-        except Exception:
-            pass
-
-        start = text.find("{")
-        end = text.rfind("}")
-        if start != -1 and end != -1 and end > start:
-            candidate = text[start : end + 1]
-            try:
-                return json.loads(candidate), None
-            except Exception as e:
-                return None, f"JSON parse error: {e}"
-        return None, "No JSON object found in model output."
\ No newline at end of file
+            return orjson.loads(text), None
+        except Exception as e:
+            return None, f"JSON parse error: {e}"
\ No newline at end of file
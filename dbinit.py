@@ -1,5 +1,9 @@
+import json
+import math
 import sqlite3
 
+MOVEMENT_TYPES = ("Mobility", "Activation", "Stability", "Power", "Balance")
+
 conn = sqlite3.connect("flexmaster.db")
 c = conn.cursor()
 
@@ -12,7 +16,12 @@ user_fields = [
     ('activation_level', 'INTEGER DEFAULT 0'),
     ('stability_level', 'INTEGER DEFAULT 0'),
     ('power_level', 'INTEGER DEFAULT 0'),
-    ('balance_level', 'INTEGER DEFAULT 0')
+    ('balance_level', 'INTEGER DEFAULT 0'),
+    ('mobility_xp', 'INTEGER DEFAULT 0'),
+    ('activation_xp', 'INTEGER DEFAULT 0'),
+    ('stability_xp', 'INTEGER DEFAULT 0'),
+    ('power_xp', 'INTEGER DEFAULT 0'),
+    ('balance_xp', 'INTEGER DEFAULT 0')
 ]
 
 for field_name, field_type in user_fields:
@@ -29,6 +38,14 @@ try:
 except:
     print("○ sport_category exists")
 
+# Add routine summary columns so views don't need to parse routine_json
+for field_name in ['exercise', 'muscle_groups', 'safety']:
+    try:
+        c.execute(f"ALTER TABLE routines ADD COLUMN {field_name} TEXT")
+        print(f"✓ Added {field_name}")
+    except:
+        print(f"○ {field_name} exists")
+
 # Create completed_exercises table
 c.execute("""
 CREATE TABLE IF NOT EXISTS completed_exercises (
@@ -45,6 +62,80 @@ CREATE TABLE IF NOT EXISTS completed_exercises (
 """)
 print("✓ Created completed_exercises table")
 
+# Create routine_warmups table (one row per warmup, replaces routine_json for views)
+c.execute("""
+CREATE TABLE IF NOT EXISTS routine_warmups (
+    routine_id INTEGER,
+    pos INTEGER,
+    name TEXT,
+    duration INTEGER,
+    notes TEXT,
+    movement_type TEXT,
+    PRIMARY KEY (routine_id, pos),
+    FOREIGN KEY (routine_id) REFERENCES routines(id)
+)
+""")
+print("✓ Created routine_warmups table")
+
+# Backfill summary columns and warmup rows for routines saved as JSON only
+legacy_routines = c.execute("""
+    SELECT id, routine_json FROM routines
+    WHERE exercise IS NULL
+       OR id NOT IN (SELECT DISTINCT routine_id FROM routine_warmups)
+""").fetchall()
+
+for routine_id, routine_json in legacy_routines:
+    try:
+        data = json.loads(routine_json)
+    except Exception:
+        continue
+    c.execute(
+        "UPDATE routines SET exercise = ?, muscle_groups = ?, safety = ? WHERE id = ?",
+        (data.get("exercise", ""), data.get("muscle_groups", ""), data.get("safety", ""), routine_id)
+    )
+    c.executemany(
+        "INSERT OR IGNORE INTO routine_warmups (routine_id, pos, name, duration, notes, movement_type) VALUES (?, ?, ?, ?, ?, ?)",
+        [
+            (routine_id, pos, w.get("name", ""), w.get("duration", 0), w.get("notes", ""), w.get("movement_type") or "Mobility")
+            for pos, w in enumerate(data.get("warmups") or [])
+        ]
+    )
+print(f"✓ Backfilled {len(legacy_routines)} routines into routine_warmups")
+
+# Create warmup_cache table for exact-match AI response caching
+c.execute("""
+CREATE TABLE IF NOT EXISTS warmup_cache (
+    key TEXT PRIMARY KEY,
+    payload TEXT,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+)
+""")
+print("✓ Created warmup_cache table")
+
+# Create warmup_batch_items table to map Batch API jobs back to cache keys
+c.execute("""
+CREATE TABLE IF NOT EXISTS warmup_batch_items (
+    batch_id TEXT,
+    custom_id TEXT,
+    cache_key TEXT,
+    exercise TEXT,
+    muscle_groups TEXT,
+    PRIMARY KEY (batch_id, custom_id)
+)
+""")
+print("✓ Created warmup_batch_items table")
+
+# Create indexes for per-user lookups
+c.execute("CREATE INDEX IF NOT EXISTS idx_ce_user_mt ON completed_exercises(user_id, movement_type)")
+c.execute("CREATE INDEX IF NOT EXISTS idx_routines_user_created ON routines(user_id, created_at DESC)")
+print("✓ Created completed_exercises and routines indexes")
+
+try:
+    c.execute("CREATE UNIQUE INDEX IF NOT EXISTS idx_users_username ON users(username)")
+    print("✓ Created username index")
+except Exception as e:
+    print(f"○ Could not create username index: {e}")
+
 # Update existing routines with proper categories if they don't have one
 try:
     c.execute("UPDATE routines SET sport_category = 'General Fitness' WHERE sport_category IS NULL OR sport_category = '' OR sport_category = 'Other'")
@@ -52,29 +143,40 @@ try:
 except Exception as e:
     print(f"○ Could not update routine categories: {e}")
 
-# Recalculate levels based on existing completed exercises
-print("\nRecalculating user levels...")
-users = c.execute("SELECT id FROM users").fetchall()
-
-for user in users:
-    user_id = user[0]
-    
-    # Calculate levels for each movement type
-    for movement_type in ["Mobility", "Activation", "Stability", "Power", "Balance"]:
-        total_xp = c.execute(
-            "SELECT COALESCE(SUM(xp_earned), 0) FROM completed_exercises WHERE user_id = ? AND movement_type = ?",
-            (user_id, movement_type)
-        ).fetchone()[0]
-        
-        # Calculate level: floor(sqrt(XP / 50))
-        import math
-        level = max(0, math.floor(math.sqrt(total_xp / 50))) if total_xp > 0 else 0
-        
-        # Update the level
-        level_field = f"{movement_type.lower()}_level"
-        c.execute(f"UPDATE users SET {level_field} = ? WHERE id = ?", (level, user_id))
-    
-    print(f"  ✓ Recalculated levels for user {user_id}")
+# Recalculate cached XP and levels based on existing completed exercises
+print("\nRecalculating user XP and levels...")
+# Every user starts with 0 XP for each movement type
+movement_xp = {
+    user_id: dict.fromkeys(MOVEMENT_TYPES, 0)
+    for (user_id,) in c.execute("SELECT id FROM users").fetchall()
+}
+
+# Aggregate XP for all users and movement types in a single scan
+xp_rows = c.execute(
+    "SELECT user_id, movement_type, COALESCE(SUM(xp_earned), 0) FROM completed_exercises GROUP BY user_id, movement_type"
+).fetchall()
+
+for user_id, movement_type, total_xp in xp_rows:
+    if user_id in movement_xp and movement_type in movement_xp[user_id]:
+        movement_xp[user_id][movement_type] = int(total_xp)
+
+rows_to_update = []
+for user_id, user_xp in movement_xp.items():
+    xp_values = [user_xp[mt] for mt in MOVEMENT_TYPES]
+    # Calculate level: floor(sqrt(XP / 50))
+    level_values = [math.isqrt(xp // 50) if xp > 0 else 0 for xp in xp_values]
+    rows_to_update.append((*xp_values, *level_values, user_id))
+
+c.executemany(
+    """
+    UPDATE users SET
+        mobility_xp = ?, activation_xp = ?, stability_xp = ?, power_xp = ?, balance_xp = ?,
+        mobility_level = ?, activation_level = ?, stability_level = ?, power_level = ?, balance_level = ?
+    WHERE id = ?
+    """,
+    rows_to_update
+)
+print(f"  ✓ Recalculated XP and levels for {len(movement_xp)} users")
 
 conn.commit()
 conn.close()
@@ -0,0 +1,16 @@
+"""
+Gunicorn settings for running FlexMaster in production:
+
+    gunicorn -c gunicorn.conf.py main:app
+"""
+import multiprocessing
+import os
+
+bind = f"0.0.0.0:{os.environ.get('PORT', 3000)}"
+workers = int(os.environ.get("WEB_CONCURRENCY", multiprocessing.cpu_count() * 2 + 1))
+worker_class = "gthread"
+threads = int(os.environ.get("GUNICORN_THREADS", 8))
+# With gthread this is the worker heartbeat timeout, not a per-request
+# limit: request threads can run longer, and OpenAI calls are bounded by
+# HTTP_TIMEOUT in ai_engine.py instead
+timeout = 120
@@ -1,51 +1,176 @@
 from __future__ import annotations
 
-import json
+import math
 import os
+import re
 import sqlite3
-from flask import Flask, render_template, request, redirect, url_for, session, jsonify
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import orjson
+from flask import Flask, Response, g, render_template, request, redirect, url_for, session, jsonify, stream_with_context
+from jinja2 import FileSystemBytecodeCache
 
 from ai_engine import AIEngine
 
 app = Flask(__name__, template_folder=".")
 app.secret_key = "super-secret-key"  # change later for production
 
-# Add custom Jinja filter for JSON parsing
-@app.template_filter('fromjson')
-def fromjson_filter(value):
-    """Parse JSON string in Jinja templates"""
-    if isinstance(value, str):
-        return json.loads(value)
-    return value
+# Templates don't change while the server runs: skip reload checks and
+# cache compiled template bytecode across worker restarts
+JINJA_CACHE_DIR = os.environ.get(
+    "FLEXMASTER_JINJA_CACHE_DIR",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), ".jinja_cache"),
+)
+app.config["TEMPLATES_AUTO_RELOAD"] = False
+app.jinja_env.auto_reload = False
+try:
+    os.makedirs(JINJA_CACHE_DIR, exist_ok=True)
+except OSError as e:
+    # Read-only deploys still work, they just compile templates per worker
+    app.logger.warning("Jinja bytecode cache disabled: %s", e)
+else:
+    app.jinja_env.bytecode_cache = FileSystemBytecodeCache(JINJA_CACHE_DIR)
 
 DB_NAME = "flexmaster.db"
 
+MOVEMENT_TYPES = ("Mobility", "Activation", "Stability", "Power", "Balance")
+
+# Each batch entry is a paid OpenAI call made while the request waits
+MAX_BATCH_ENTRIES = 10
+# Upper bound for a single completion; the client sends 10 per exercise
+MAX_XP_PER_EXERCISE = 1000
+
+# Category mapping based on exercise keywords
+CATEGORY_KEYWORDS = {
+    "Running": ["running", "run", "sprint", "jog", "marathon", "5k", "10k"],
+    "Weightlifting": ["squat", "deadlift", "bench press", "overhead press", "lifting", "weights", "barbell", "dumbbell"],
+    "Cycling": ["cycling", "bike", "biking", "spin"],
+    "Swimming": ["swimming", "swim", "freestyle", "backstroke", "breaststroke"],
+    "Tennis": ["tennis", "serve", "forehand", "backhand"],
+    "Basketball": ["basketball", "jump shot", "layup", "dunk", "free throw"],
+    "Soccer": ["soccer", "football", "kick", "dribbling"],
+    "Yoga": ["yoga", "downward dog", "warrior", "tree pose", "sun salutation"],
+    "Martial Arts": ["martial arts", "karate", "taekwondo", "judo", "boxing", "kickboxing", "mma"],
+    "Rock Climbing": ["climbing", "bouldering", "rock climbing"],
+    "CrossFit": ["crossfit", "wod", "amrap", "emom"],
+    "Pilates": ["pilates"],
+    "Dance": ["dance", "ballet", "hip hop", "contemporary"],
+    "Golf": ["golf", "swing", "putt", "drive"],
+    "Volleyball": ["volleyball", "spike", "serve", "bump"],
+}
+
+# Flattened keyword -> category lookup; the first category listing a
+# keyword wins (e.g. "serve" stays Tennis), matching the old loop order.
+KEYWORD_TO_CATEGORY = {}
+for _category, _keywords in CATEGORY_KEYWORDS.items():
+    for _keyword in _keywords:
+        KEYWORD_TO_CATEGORY.setdefault(_keyword, _category)
+
+# One alternation over every keyword, longest first. Keywords must start
+# a word but may carry a plural/-ing/-er suffix ("squats", "spinning",
+# "runners"), but never match inside another word (e.g. "spine").
+KEYWORD_RE = re.compile(
+    r"\b(" + "|".join(map(re.escape, sorted(KEYWORD_TO_CATEGORY, key=len, reverse=True))) + r")"
+    r"(?:\w?(?:ing|ers?)|e?s)?\b"
+)
+
 MODEL = os.environ.get("FLEXMASTER_MODEL", "gpt-4.1-mini")
 engine = None
+engine_lock = threading.Lock()
 
 
 def get_engine() -> AIEngine:
+    """Return the shared engine, so every request reuses one pooled HTTP client.
+    
+    Created on first use: a missing OPENAI_API_KEY only fails routine
+    generation, not login, signup or the profile pages.
+    """
     global engine
     if engine is None:
-        engine = AIEngine(model=MODEL)
+        with engine_lock:
+            if engine is None:
+                engine = AIEngine(model=MODEL, cache_db=DB_NAME)
     return engine
 
+# Optional background cache warming of related sports: after a routine is
+# saved, the user's profile and muscle groups are used to pre-generate a few
+# other sports from the same category, so trying one of them next is a cache
+# hit. Each prefetch is a paid OpenAI call, so this is off unless
+# FLEXMASTER_PREFETCH=1. The semaphore caps queued + running prefetches to
+# respect OpenAI rate limits.
+PREFETCH_ENABLED = os.environ.get("FLEXMASTER_PREFETCH") == "1"
+PREFETCH_PER_ROUTINE = 2
+PREFETCH_LIMIT = 4
+prefetch_executor = ThreadPoolExecutor(max_workers=PREFETCH_LIMIT, thread_name_prefix="warmup-prefetch")
+prefetch_slots = threading.BoundedSemaphore(PREFETCH_LIMIT)
+
+
+def _prefetch_done(future):
+    """Free the prefetch slot and log failures the executor would otherwise swallow"""
+    prefetch_slots.release()
+    error = future.exception()
+    if error is not None:
+        app.logger.warning("Warmup prefetch failed: %r", error)
+
+
+def related_sports(ai, exercise, limit=PREFETCH_PER_ROUTINE):
+    """Other known sports in the same category as exercise"""
+    category = ai.categorize_sport(exercise)
+    if category == "Other":
+        return []
+    exercise = exercise.lower().strip()
+    related = [
+        sport for sport, sport_category in ai.SPORT_CATEGORIES.items()
+        if sport_category == category and sport != exercise
+    ]
+    return related[:limit]
+
+
+def prefetch_related_warmups(exercise, muscle_groups, user_data):
+    """Generate routines for related sports in the background so they land in warmup_cache"""
+    if not PREFETCH_ENABLED:
+        return
+    
+    ai = get_engine()
+    for sport in related_sports(ai, exercise):
+        # Drop the prefetch rather than queue behind live traffic
+        if not prefetch_slots.acquire(blocking=False):
+            return
+        try:
+            future = prefetch_executor.submit(ai.generate_warmups, sport, muscle_groups, user_data)
+        except RuntimeError as e:
+            # Executor already shut down; the slot was never handed off
+            prefetch_slots.release()
+            app.logger.warning("Warmup prefetch not scheduled: %r", e)
+            return
+        future.add_done_callback(_prefetch_done)
+
 
 def get_db():
-    conn = sqlite3.connect(DB_NAME)
-    conn.row_factory = sqlite3.Row
-    return conn
+    """Return the SQLite connection shared by the current request"""
+    if "db" not in g:
+        g.db = sqlite3.connect(DB_NAME)
+        g.db.row_factory = sqlite3.Row
+        # WAL lets readers proceed while a write is in progress
+        g.db.execute("PRAGMA journal_mode=WAL")
+        g.db.execute("PRAGMA synchronous=NORMAL")
+    return g.db
+
+
+@app.teardown_appcontext
+def close_db(exception=None):
+    conn = g.pop("db", None)
+    if conn is not None:
+        conn.close()
 
 
 # -------------------- XP & LEVELING SYSTEM --------------------
 
 def calculate_level(xp):
     """Calculate level from XP (exponential growth)"""
-    # Level = floor(sqrt(XP / 50))
-    import math
-    if xp <= 0:
-        return 0
-    return max(0, math.floor(math.sqrt(xp / 50)))
+    # Level = floor(sqrt(XP / 50)), computed in exact integer arithmetic
+    return math.isqrt(int(xp) // 50) if xp > 0 else 0
 
 
 def xp_for_next_level(current_level):
@@ -53,60 +178,40 @@ def xp_for_next_level(current_level):
     return (current_level + 1) ** 2 * 50
 
 
-def update_movement_level(user_id, movement_type, xp_amount):
-    """Update user's movement type level based on XP"""
+def record_completed_exercise(user_id, routine_id, exercise_name, movement_type, xp_earned):
+    """Save a completed exercise and award its XP in a single transaction"""
     conn = get_db()
-    
-    # Get current XP for this movement type
-    current_xp = conn.execute(
-        "SELECT COALESCE(SUM(xp_earned), 0) as total FROM completed_exercises WHERE user_id = ? AND movement_type = ?",
-        (user_id, movement_type)
-    ).fetchone()["total"]
-    
-    # Calculate new level
-    new_level = calculate_level(current_xp)
-    
-    # Update the level in users table
+    xp_field = f"{movement_type.lower()}_xp"
     level_field = f"{movement_type.lower()}_level"
-    conn.execute(
-        f"UPDATE users SET {level_field} = ? WHERE id = ?",
-        (new_level, user_id)
-    )
-    
-    conn.commit()
-    conn.close()
-
-
-def add_xp(user_id, movement_type, xp_amount):
-    """Add XP to user's specific movement type level"""
-    conn = get_db()
-    
-    # Add total XP
-    conn.execute(
-        "UPDATE users SET total_xp = total_xp + ? WHERE id = ?",
-        (xp_amount, user_id)
-    )
-    
-    conn.commit()
-    conn.close()
     
-    # Update the movement-specific level
-    update_movement_level(user_id, movement_type, xp_amount)
-
-
-def save_completed_exercise(user_id, routine_id, exercise_name, movement_type, xp_earned):
-    """Save a completed exercise to track progress"""
-    conn = get_db()
-    conn.execute(
-        """
-        INSERT INTO completed_exercises 
-        (user_id, routine_id, exercise_name, movement_type, xp_earned)
-        VALUES (?, ?, ?, ?, ?)
-        """,
-        (user_id, routine_id, exercise_name, movement_type, xp_earned)
-    )
-    conn.commit()
-    conn.close()
+    with conn:
+        conn.execute(
+            """
+            INSERT INTO completed_exercises 
+            (user_id, routine_id, exercise_name, movement_type, xp_earned)
+            VALUES (?, ?, ?, ?, ?)
+            """,
+            (user_id, routine_id, exercise_name, movement_type, xp_earned)
+        )
+        
+        # Bump the cached movement XP instead of re-summing history
+        user = conn.execute(
+            f"""
+            UPDATE users SET total_xp = total_xp + ?, {xp_field} = COALESCE({xp_field}, 0) + ?
+            WHERE id = ?
+            RETURNING {xp_field} AS xp
+            """,
+            (xp_earned, xp_earned, user_id)
+        ).fetchone()
+        
+        # Only touch the level column when this XP crossed a level boundary
+        if user:
+            new_level = calculate_level(user["xp"])
+            if new_level != calculate_level(user["xp"] - xp_earned):
+                conn.execute(
+                    f"UPDATE users SET {level_field} = ? WHERE id = ?",
+                    (new_level, user_id)
+                )
 
 
 # -------------------- AUTH ROUTES --------------------
@@ -130,7 +235,6 @@ def signup():
                 (username, password, age, fitness, preference),
             )
             conn.commit()
-            conn.close()
             return redirect(url_for("login"))
         except sqlite3.IntegrityError:
             return render_template("signup.html", error="Username already exists")
@@ -149,7 +253,6 @@ def login():
             "SELECT * FROM users WHERE username=? AND password=?",
             (username, password),
         ).fetchone()
-        conn.close()
 
         if user:
             session["user_id"] = user["id"]
@@ -190,12 +293,7 @@ def home():
         )
 
     # Get user data for personalization
-    user = get_user(session["user_id"])
-    user_data = {
-        "age": user["age"] if user else None,
-        "fitness_level": user["fitness_level"] if user else None,
-        "preference": user["preference"] if user else None,
-    }
+    user_data = get_user_data(session["user_id"])
 
     result = get_engine().generate_warmups(
         exercise=exercise,
@@ -207,6 +305,7 @@ def home():
     routine_id = None
     if result.get("warmups") and not result.get("error"):
         routine_id = save_routine(session["user_id"], result)
+        prefetch_related_warmups(exercise, muscle_groups, user_data)
 
     # Redirect to interactive routine page
     if routine_id:
@@ -231,14 +330,23 @@ def get_user(user_id):
         "SELECT * FROM users WHERE id = ?",
         (user_id,)
     ).fetchone()
-    conn.close()
     return user
 
 
+def get_user_data(user_id):
+    """Get the profile fields used to personalize generated routines"""
+    user = get_user(user_id)
+    return {
+        "age": user["age"] if user else None,
+        "fitness_level": user["fitness_level"] if user else None,
+        "preference": user["preference"] if user else None,
+    }
+
+
 def save_routine(user_id, routine_data):
     """Save a generated routine to the database"""
     conn = get_db()
-    routine_json = json.dumps(routine_data)
+    routine_json = orjson.dumps(routine_data).decode()
     
     # Extract or infer sport category
     sport_category = routine_data.get("sport_category", "General Fitness")
@@ -247,95 +355,155 @@ def save_routine(user_id, routine_data):
     if sport_category == "Other" or not sport_category:
         exercise_name = routine_data.get("exercise", "").lower()
         
-        # Category mapping based on exercise keywords
-        category_keywords = {
-            "Running": ["running", "run", "sprint", "jog", "marathon", "5k", "10k"],
-            "Weightlifting": ["squat", "deadlift", "bench press", "overhead press", "lifting", "weights", "barbell", "dumbbell"],
-            "Cycling": ["cycling", "bike", "biking", "spin"],
-            "Swimming": ["swimming", "swim", "freestyle", "backstroke", "breaststroke"],
-            "Tennis": ["tennis", "serve", "forehand", "backhand"],
-            "Basketball": ["basketball", "jump shot", "layup", "dunk", "free throw"],
-            "Soccer": ["soccer", "football", "kick", "dribbling"],
-            "Yoga": ["yoga", "downward dog", "warrior", "tree pose", "sun salutation"],
-            "Martial Arts": ["martial arts", "karate", "taekwondo", "judo", "boxing", "kickboxing", "mma"],
-            "Rock Climbing": ["climbing", "bouldering", "rock climbing"],
-            "CrossFit": ["crossfit", "wod", "amrap", "emom"],
-            "Pilates": ["pilates"],
-            "Dance": ["dance", "ballet", "hip hop", "contemporary"],
-            "Golf": ["golf", "swing", "putt", "drive"],
-            "Volleyball": ["volleyball", "spike", "serve", "bump"],
-        }
-        
         # Check for keyword matches
-        for category, keywords in category_keywords.items():
-            if any(keyword in exercise_name for keyword in keywords):
-                sport_category = category
-                break
+        match = KEYWORD_RE.search(exercise_name)
+        if match:
+            sport_category = KEYWORD_TO_CATEGORY[match.group(1)]
         
         # If still no category, default to General Fitness
         if not sport_category or sport_category == "Other":
             sport_category = "General Fitness"
     
     cursor = conn.execute(
-        "INSERT INTO routines (user_id, routine_json, sport_category) VALUES (?, ?, ?)",
-        (user_id, routine_json, sport_category)
+        """
+        INSERT INTO routines (user_id, routine_json, sport_category, exercise, muscle_groups, safety)
+        VALUES (?, ?, ?, ?, ?, ?)
+        """,
+        (
+            user_id,
+            routine_json,
+            sport_category,
+            routine_data.get("exercise", ""),
+            routine_data.get("muscle_groups", ""),
+            routine_data.get("safety", ""),
+        )
     )
     routine_id = cursor.lastrowid
+    
+    # Store each warmup as its own row so views don't have to parse the JSON
+    conn.executemany(
+        """
+        INSERT INTO routine_warmups (routine_id, pos, name, duration, notes, movement_type)
+        VALUES (?, ?, ?, ?, ?, ?)
+        """,
+        [
+            (
+                routine_id,
+                pos,
+                warmup.get("name", ""),
+                warmup.get("duration", 0),
+                warmup.get("notes", ""),
+                warmup.get("movement_type") or "Mobility",
+            )
+            for pos, warmup in enumerate(routine_data.get("warmups", []))
+        ]
+    )
     conn.commit()
-    conn.close()
     return routine_id
 
 
+def get_routine_detail(routine_id):
+    """Get a routine and its ordered warmups"""
+    conn = get_db()
+    routine = conn.execute(
+        "SELECT id, user_id, exercise, muscle_groups, safety FROM routines WHERE id = ?",
+        (routine_id,)
+    ).fetchone()
+    if not routine:
+        return None, []
+    
+    warmups = conn.execute(
+        "SELECT name, duration, notes, movement_type FROM routine_warmups WHERE routine_id = ? ORDER BY pos",
+        (routine_id,)
+    ).fetchall()
+    if warmups:
+        return routine, warmups
+    
+    # Fall back to the JSON blob for routines saved before routine_warmups existed
+    routine_data = orjson.loads(conn.execute(
+        "SELECT routine_json FROM routines WHERE id = ?",
+        (routine_id,)
+    ).fetchone()["routine_json"])
+    
+    # Ensure all warmups have movement_type (for older routines)
+    warmups = routine_data.get("warmups", [])
+    for warmup in warmups:
+        if "movement_type" not in warmup:
+            warmup["movement_type"] = "Mobility"  # Default
+    
+    routine = {
+        "id": routine["id"],
+        "user_id": routine["user_id"],
+        "exercise": routine_data.get("exercise", ""),
+        "muscle_groups": routine_data.get("muscle_groups", ""),
+        "safety": routine_data.get("safety", ""),
+    }
+    return routine, warmups
+
+
 def get_routines(user_id):
-    """Get all routines for a specific user"""
+    """Get routine summaries (no JSON) for a specific user, newest first"""
     conn = get_db()
     routines = conn.execute(
-        "SELECT routine_json, id, created_at, sport_category FROM routines WHERE user_id = ? ORDER BY created_at DESC",
+        """
+        SELECT r.id, r.created_at, r.exercise, r.muscle_groups,
+               CASE WHEN r.sport_category IS NULL OR r.sport_category IN ('', 'Other')
+                    THEN 'General Fitness' ELSE r.sport_category END AS sport_category,
+               COUNT(w.pos) AS warmup_count,
+               COALESCE(SUM(w.duration), 0) AS total_duration
+        FROM routines r
+        LEFT JOIN routine_warmups w ON w.routine_id = r.id
+        WHERE r.user_id = ?
+        GROUP BY r.id
+        ORDER BY r.created_at DESC
+        """,
         (user_id,)
     ).fetchall()
-    conn.close()
     return routines
 
 
+def get_routine_category_counts(user_id):
+    """Get the number of routines per sport category for a user"""
+    conn = get_db()
+    rows = conn.execute(
+        """
+        SELECT CASE WHEN sport_category IS NULL OR sport_category IN ('', 'Other')
+                    THEN 'General Fitness' ELSE sport_category END AS category,
+               COUNT(*) AS count
+        FROM routines WHERE user_id = ? GROUP BY category
+        """,
+        (user_id,)
+    ).fetchall()
+    return {row["category"]: row["count"] for row in rows}
+
+
 def get_user_stats(user_id):
     """Get user statistics for gamification"""
     conn = get_db()
     
-    # Get total routines
-    total_routines = conn.execute(
-        "SELECT COUNT(*) as count FROM routines WHERE user_id = ?",
-        (user_id,)
-    ).fetchone()["count"]
-    
-    # Get total completed exercises
-    total_exercises = conn.execute(
-        "SELECT COUNT(*) as count FROM completed_exercises WHERE user_id = ?",
-        (user_id,)
-    ).fetchone()["count"]
-    
-    # Get user XP and levels
+    # Get total XP, routines and completed exercises in one query
     user = conn.execute(
-        "SELECT total_xp, mobility_level, activation_level, stability_level, power_level, balance_level FROM users WHERE id = ?",
-        (user_id,)
+        """
+        SELECT total_xp,
+               (SELECT COUNT(*) FROM routines WHERE user_id = ?) AS total_routines,
+               (SELECT COUNT(*) FROM completed_exercises WHERE user_id = ?) AS total_exercises
+        FROM users WHERE id = ?
+        """,
+        (user_id, user_id, user_id)
     ).fetchone()
     
     # Get XP per movement type and calculate levels dynamically
-    movement_xp = {}
-    calculated_levels = {}
-    for movement_type in ["Mobility", "Activation", "Stability", "Power", "Balance"]:
-        xp = conn.execute(
-            "SELECT COALESCE(SUM(xp_earned), 0) as total FROM completed_exercises WHERE user_id = ? AND movement_type = ?",
-            (user_id, movement_type)
-        ).fetchone()["total"]
-        movement_xp[movement_type.lower()] = xp
-        calculated_levels[movement_type.lower()] = calculate_level(xp)
-    
-    conn.close()
+    xp_by_type = dict(conn.execute(
+        "SELECT movement_type, COALESCE(SUM(xp_earned), 0) FROM completed_exercises WHERE user_id = ? GROUP BY movement_type",
+        (user_id,)
+    ).fetchall())
+    movement_xp = {mt.lower(): xp_by_type.get(mt, 0) for mt in MOVEMENT_TYPES}
+    calculated_levels = {mt: calculate_level(xp) for mt, xp in movement_xp.items()}
     
     return {
         "total_xp": user["total_xp"] or 0,
-        "total_routines": total_routines,
-        "total_exercises": total_exercises,
+        "total_routines": user["total_routines"],
+        "total_exercises": user["total_exercises"],
         "levels": calculated_levels,  # Use calculated levels instead of stored ones
         "movement_xp": movement_xp
     }
@@ -352,16 +520,8 @@ def profile():
     routines = get_routines(user_id)
     stats = get_user_stats(user_id)
     
-    # Group routines by category
-    categories = {}
-    for routine in routines:
-        data = json.loads(routine["routine_json"])
-        category = data.get("sport_category", "General Fitness")
-        if not category or category == "Other":
-            category = "General Fitness"
-        if category not in categories:
-            categories[category] = []
-        categories[category].append(routine)
+    # Routine counts per category, grouped by SQLite from the sport_category column
+    categories = get_routine_category_counts(user_id)
     
     return render_template(
         "profile.html",
@@ -379,26 +539,18 @@ def view_routine(routine_id):
     if "user_id" not in session:
         return redirect(url_for("login"))
     
-    conn = get_db()
-    routine = conn.execute(
-        "SELECT routine_json, user_id FROM routines WHERE id = ?",
-        (routine_id,)
-    ).fetchone()
-    conn.close()
+    routine, warmups = get_routine_detail(routine_id)
     
     if not routine or routine["user_id"] != session["user_id"]:
         return redirect(url_for("profile"))
     
-    routine_data = json.loads(routine["routine_json"])
-    
     return render_template(
         "results.html",
-        exercise=routine_data.get("exercise", ""),
-        muscle_groups=routine_data.get("muscle_groups", ""),
-        warmups=routine_data.get("warmups", []),
-        safety=routine_data.get("safety", ""),
-        error=routine_data.get("error"),
-        raw=routine_data.get("raw", ""),
+        exercise=routine["exercise"] or "",
+        muscle_groups=routine["muscle_groups"] or "",
+        warmups=warmups,
+        safety=routine["safety"] or "",
+        error=None,  # only successfully generated routines are saved
         username=session["username"],
         routine_id=routine_id
     )
@@ -410,35 +562,99 @@ def interactive_routine(routine_id):
     if "user_id" not in session:
         return redirect(url_for("login"))
     
-    conn = get_db()
-    routine = conn.execute(
-        "SELECT routine_json, user_id FROM routines WHERE id = ?",
-        (routine_id,)
-    ).fetchone()
-    conn.close()
+    routine, warmups = get_routine_detail(routine_id)
     
     if not routine or routine["user_id"] != session["user_id"]:
         return redirect(url_for("profile"))
     
-    routine_data = json.loads(routine["routine_json"])
-    
-    # Ensure all warmups have movement_type (for older routines)
-    warmups = routine_data.get("warmups", [])
-    for warmup in warmups:
-        if "movement_type" not in warmup:
-            warmup["movement_type"] = "Mobility"  # Default
-    
     return render_template(
         "interactive_routine.html",
         routine_id=routine_id,
-        exercise=routine_data.get("exercise", ""),
-        muscle_groups=routine_data.get("muscle_groups", ""),
+        exercise=routine["exercise"] or "",
+        muscle_groups=routine["muscle_groups"] or "",
         warmups=warmups,
-        safety=routine_data.get("safety", ""),
+        safety=routine["safety"] or "",
         username=session["username"]
     )
 
 
+@app.route("/api/batch_warmups", methods=["POST"])
+def batch_warmups():
+    """API endpoint to generate routines for several exercises concurrently"""
+    if "user_id" not in session:
+        return jsonify({"error": "Not authenticated"}), 401
+    
+    data = request.json
+    if not isinstance(data, list):
+        return jsonify({"error": "Expected a JSON list of exercises"}), 400
+    if len(data) > MAX_BATCH_ENTRIES:
+        return jsonify({"error": f"At most {MAX_BATCH_ENTRIES} exercises per batch"}), 400
+    
+    items = []
+    for entry in data:
+        exercise = (entry.get("exercise") or "").strip() if isinstance(entry, dict) else ""
+        muscle_groups = (entry.get("muscle_groups") or "").strip() if isinstance(entry, dict) else ""
+        if not exercise or not muscle_groups:
+            return jsonify({"error": "Each entry needs an exercise and muscle_groups"}), 400
+        items.append((exercise, muscle_groups))
+    
+    # Get user data for personalization
+    user_data = get_user_data(session["user_id"])
+    
+    results = get_engine().generate_warmups_batch(
+        [(exercise, muscle_groups, user_data) for exercise, muscle_groups in items]
+    )
+    
+    # Save successful routines, same as the single-routine flow
+    for result in results:
+        result["routine_id"] = None
+        if result.get("warmups") and not result.get("error"):
+            result["routine_id"] = save_routine(session["user_id"], result)
+    
+    return jsonify({"results": results})
+
+
+@app.route("/api/stream_warmups")
+def stream_warmups():
+    """
+    Server-Sent Events endpoint that streams warmups as they are generated.
+    
+    Read-only: nothing is saved here. The finished routine lands in the
+    warmup cache, and the page then submits the regular POST / form, which
+    is served from that cache entry and saves the routine.
+    """
+    if "user_id" not in session:
+        return jsonify({"error": "Not authenticated"}), 401
+    
+    exercise = (request.args.get("exercise") or "").strip()
+    muscle_groups = (request.args.get("muscle_groups") or "").strip()
+    if not exercise or not muscle_groups:
+        return jsonify({"error": "Please enter both the exercise name and target muscle groups."}), 400
+    
+    user_data = get_user_data(session["user_id"])
+    
+    def sse_events():
+        # Ask clients that don't close on "done" to wait an hour before reconnecting
+        yield "retry: 3600000\n\n"
+        for event in get_engine().generate_warmups_stream(
+            exercise=exercise,
+            muscle_groups=muscle_groups,
+            user_data=user_data
+        ):
+            if event["type"] == "warmup":
+                yield f"event: warmup\ndata: {orjson.dumps(event['warmup']).decode()}\n\n"
+                continue
+            
+            # Terminal event: the client closes the stream when it sees this
+            yield f"event: done\ndata: {orjson.dumps(event['result']).decode()}\n\n"
+    
+    return Response(
+        stream_with_context(sse_events()),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
 @app.route("/api/complete_exercise", methods=["POST"])
 def complete_exercise():
     """API endpoint to mark an exercise as complete and award XP"""
@@ -451,8 +667,25 @@ def complete_exercise():
     movement_type = data.get("movement_type")
     xp_earned = data.get("xp_earned", 10)
     
-    # Save completed exercise
-    save_completed_exercise(
+    # movement_type selects the XP/level columns, so only accept known types
+    if movement_type not in MOVEMENT_TYPES:
+        return jsonify({"error": "Invalid movement type"}), 400
+    
+    # Accept numeric strings such as "10", matching SQLite's old coercion,
+    # but not booleans or fractional XP
+    if isinstance(xp_earned, bool) or (
+        isinstance(xp_earned, float) and not xp_earned.is_integer()
+    ):
+        return jsonify({"error": "Invalid xp_earned"}), 400
+    try:
+        xp_earned = int(xp_earned)
+    except (TypeError, ValueError, OverflowError):
+        return jsonify({"error": "Invalid xp_earned"}), 400
+    if not 0 <= xp_earned <= MAX_XP_PER_EXERCISE:
+        return jsonify({"error": "Invalid xp_earned"}), 400
+    
+    # Save completed exercise, add XP to user and update level
+    record_completed_exercise(
         session["user_id"],
         routine_id,
         exercise_name,
@@ -460,9 +693,6 @@ def complete_exercise():
         xp_earned
     )
     
-    # Add XP to user and update level
-    add_xp(session["user_id"], movement_type, xp_earned)
-    
     return jsonify({"success": True, "xp_earned": xp_earned})
 
 
@@ -483,11 +713,12 @@ def complete_routine():
         (bonus_xp, session["user_id"])
     )
     conn.commit()
-    conn.close()
     
     return jsonify({"success": True, "bonus_xp": bonus_xp})
 
 
 if __name__ == "__main__":
+    # Local development only; in production run:
+    #   gunicorn -c gunicorn.conf.py main:app
     port = int(os.environ.get("PORT", 3000))
     app.run(host="0.0.0.0", port=port, debug=False)
\ No newline at end of file
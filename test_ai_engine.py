@@ -0,0 +1,56 @@
+import orjson
+import pytest
+
+from ai_engine import AIEngine, _WarmupStreamScanner
+
+
+@pytest.fixture
+def engine(monkeypatch):
+    monkeypatch.setenv("OPENAI_API_KEY", "test-key")
+    return AIEngine()
+
+
+@pytest.mark.parametrize("exercise", ["hip thrusts", "Hip mobility", "hip flexor stretch", "table", "rock", "arts and crafts", "dilemma", "abundance drills"])
+def test_categorize_sport_ignores_fragments_of_multi_word_keys(engine, exercise):
+    assert engine.categorize_sport(exercise) == "Other"
+
+
+@pytest.mark.parametrize("exercise, category", [
+    ("Hip hop", "Dance"),
+    ("hip hop choreography", "Dance"),
+    ("rock climbing", "Outdoor"),
+    ("indoor rock climbing session", "Outdoor"),
+    ("table tennis drills", "Racket Sports"),
+    ("martial arts", "Combat Sports"),
+    ("morning yoga flow", "Flexibility"),
+    ("trailrunning", "Endurance"),
+    ("swimmingpool laps", "Endurance"),
+])
+def test_categorize_sport_partial_matches(engine, exercise, category):
+    assert engine.categorize_sport(exercise) == category
+
+
+WARMUPS = [
+    {"name": "Band {pull} apart", "movement_type": "Activation", "cue": 'Say "squeeze ]" and hold', "sets": 2},
+    {"name": "Hip circles", "movement_type": "Mobility", "cue": "Back\\slash } and [brackets]", "sets": 1},
+]
+STREAM_TEXT = orjson.dumps({"exercise": "Tennis", "warmups": WARMUPS, "safety": "Stop if it hurts]}"}).decode()
+
+
+def _feed_in_chunks(text, size):
+    scanner = _WarmupStreamScanner()
+    items = []
+    for start in range(0, len(text), size):
+        items.extend(scanner.feed(text[start:start + size]))
+    return scanner, items
+
+
+@pytest.mark.parametrize("size", range(1, 8))
+def test_stream_scanner_emits_each_warmup_across_chunk_boundaries(size):
+    _, items = _feed_in_chunks(STREAM_TEXT, size)
+    assert items == WARMUPS
+
+
+def test_stream_scanner_ignores_output_after_the_array():
+    scanner, _ = _feed_in_chunks(STREAM_TEXT, 5)
+    assert scanner.feed(', "extra": [{"name": "late"}]}') == []